@@ -6,8 +6,11 @@ import pyperclip
 import logging
 import schedule
 import argparse
+from collections import deque
 
 from weather_service import get_weather_data
+from failure_recorder import FailureFrameRecorder
+from template_matcher import load_template, template_fits, match_template
 
 # 设置pyautogui的暂停时间和紧急停止功能
 pyautogui.PAUSE = 0.5
@@ -33,6 +36,11 @@ REGION_CHAT_WINDOW_BOTTOM = (int(SCREEN_WIDTH * 0.30), int(SCREEN_HEIGHT * 0.85)
 REGION_CHAT_WINDOW_TOP = (int(SCREEN_WIDTH * 0.70), int(SCREEN_HEIGHT * 0.10), int(SCREEN_WIDTH * 0.25),
                           int(SCREEN_HEIGHT * 0.10))
 
+# --- 失败现场记录 ---
+# 复用匹配时抓取的区域截图，未命中时缩小压缩后保存在内存中；查找失败时写入 failure_dumps/ 目录
+# 每步 20 帧，与滚动查找好友的最大页数一致 (每页只保留一帧)
+frame_recorder = FailureFrameRecorder(dump_dir='failure_dumps', frames_per_step=20, max_bytes=16 * 1024 * 1024)
+
 
 def setup_logging():
     """配置日志系统"""
@@ -55,24 +63,56 @@ def setup_logging():
     logger.addHandler(console_handler)
 
 
-def find_and_click(image_path, confidence=0.8, timeout=5, region=None):
+def find_and_click(image_path, confidence=0.8, timeout=5, region=None, dump_on_failure=True, frame_info=None,
+                   template=None):
     """
     在屏幕上查找图像并点击
+    :param dump_on_failure: 超时后是否立即保存失败现场。由外层循环统一处理失败时传 False，
+                            此时本次调用只保留得分最高的一帧。
+    :param frame_info: 随记录帧写入失败现场的附加信息，例如滚动页码
+    :param template: 已读取的模板，多次查找同一图片时传入以免重复读盘
     """
+    if template is None:
+        template = load_template(image_path)
+        if template is None:
+            return False
+
     start_time = time.time()
+    # 本次调用中未命中的原始截图 (得分, 截图, 坐标)，只在超时后才压缩记录，成功时直接丢弃
+    misses = deque(maxlen=frame_recorder.frames_per_step)
+    reason = f"{timeout} 秒内未找到图片"
     logging.info(f"正在 {(('区域 ' + str(region)) if region else '全屏')} 寻找 '{image_path}'...")
     while time.time() - start_time < timeout:
         try:
-            # 查找图片中心点
-            location = pyautogui.locateCenterOnScreen(image_path, confidence=confidence, region=region)
-            if location:
-                logging.info(f"✅ 找到 '{image_path}' 在 {location}，准备点击。")
+            # 截图只抓取一次，匹配与失败现场记录共用同一帧
+            screenshot = pyautogui.screenshot(region=region)
+            if not template_fits(screenshot, template):
+                logging.error(f"❌ 模板 '{image_path}' 尺寸 {template.shape[1]}x{template.shape[0]} "
+                              f"大于截图区域 {screenshot.width}x{screenshot.height}，无法匹配。")
+                misses.append((None, screenshot, None))
+                reason = "模板尺寸大于截图区域"
+                break
+            score, location = match_template(screenshot, template, region)
+            if score >= confidence:
+                logging.info(f"✅ 找到 '{image_path}' 在 {location} (得分 {score:.3f})，准备点击。")
+                frame_recorder.discard(image_path)
                 pyautogui.click(location)
                 return True
+            misses.append((score, screenshot, location))
         except pyautogui.PyAutoGUIException:
             pass
         time.sleep(0.5)  # 缩短单次循环间隔，提高响应速度
-    logging.warning(f"❌ 超时！在 {timeout} 秒内未找到图片: '{image_path}'")
+    else:
+        logging.warning(f"❌ 超时！在 {timeout} 秒内未找到图片: '{image_path}'")
+
+    if not dump_on_failure and misses:
+        # 只保留本次调用得分最高的一帧
+        misses = [max(misses, key=lambda miss: -1 if miss[0] is None else miss[0])]
+    for score, screenshot, location in misses:
+        frame_recorder.record(image_path, screenshot, region, score, location, frame_info)
+    if dump_on_failure:
+        frame_recorder.dump(image_path, template_path=image_path, confidence=confidence,
+                            reason=reason, extra={'timeout': timeout})
     return False
 
 
@@ -104,11 +144,17 @@ def find_friend_with_scrolling(friend_avatar_path, max_scrolls=20):
     """
     logging.info(f"🔍 开始在列表查找好友头像: {friend_avatar_path}")
 
+    # 模板只读取一次；头像缺失或损坏时直接返回，避免白白滚动整个列表
+    template = load_template(friend_avatar_path)
+    if template is None:
+        return False
+
     for i in range(max_scrolls):
         # 1. 尝试在当前视野中查找好友
         # 【关键修改】timeout 增加到 3 秒。
         # 给程序足够的时间“看清”当前屏幕，防止因为识别慢而错过
-        if find_and_click(friend_avatar_path, confidence=0.75, timeout=3, region=REGION_FRIEND_LIST):
+        if find_and_click(friend_avatar_path, confidence=0.75, timeout=3, region=REGION_FRIEND_LIST,
+                          dump_on_failure=False, frame_info={'page': i + 1}, template=template):
             return True
 
         logging.info(f"📄 第 {i + 1} 页未找到，正在滚动...")
@@ -121,6 +167,9 @@ def find_friend_with_scrolling(friend_avatar_path, max_scrolls=20):
         time.sleep(2)
 
     logging.error(f"❌ 已滚动 {max_scrolls} 次，仍未找到好友头像: {friend_avatar_path}")
+    frame_recorder.dump(friend_avatar_path, template_path=friend_avatar_path, confidence=0.75,
+                        reason=f"滚动 {max_scrolls} 次后仍未找到好友头像",
+                        extra={'max_scrolls': max_scrolls, 'scroll_amount': -200})
     return False
 
 
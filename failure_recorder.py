@@ -0,0 +1,170 @@
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class FailureFrameRecorder:
+    """
+    失败现场记录器：为每个查找步骤保留最近 N 帧区域截图的环形缓冲区
+
+    截图直接复用匹配时已经抓取的画面，只在未匹配时缩小并压缩为 JPEG 存放在内存中，
+    总占用不超过 max_bytes。步骤成功时丢弃对应缓存；失败时把缓存的画面、
+    尝试过的区域以及匹配时的真实得分一起写入带时间戳的目录，方便一次运行即可复盘。
+    """
+
+    def __init__(self, dump_dir='failure_dumps', frames_per_step=16, max_bytes=16 * 1024 * 1024,
+                 scale=0.5, jpeg_quality=70):
+        """
+        :param dump_dir: 失败现场的输出根目录
+        :param frames_per_step: 每个步骤最多保留的帧数
+        :param max_bytes: 所有步骤缓存帧的内存总预算 (字节)
+        :param scale: 存储前的缩放比例
+        :param jpeg_quality: JPEG 压缩质量
+        """
+        self.dump_dir = dump_dir
+        self.frames_per_step = frames_per_step
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self._frames = {}
+        self._total_bytes = 0
+        self._seq = 0
+
+    def record(self, step, frame, region=None, score=None, location=None, info=None):
+        """
+        记录一帧匹配时抓取且未命中的截图
+
+        :param step: 步骤标识，通常是模板图片路径
+        :param frame: PIL.Image 截图
+        :param region: 截图对应的屏幕区域 (left, top, width, height)，None 表示全屏
+        :param score: 匹配时在原始分辨率截图上得到的最高得分
+        :param location: 最高得分对应的屏幕坐标 (模板中心)
+        :param info: 需要随该帧写入 meta.json 的附加信息，例如滚动页码
+        """
+        width, height = frame.size
+        try:
+            small = frame.convert('RGB')
+            if self.scale != 1:
+                small = small.resize((max(1, int(width * self.scale)), max(1, int(height * self.scale))))
+            buffer = io.BytesIO()
+            small.save(buffer, format='JPEG', quality=self.jpeg_quality)
+            data = buffer.getvalue()
+        except Exception as e:
+            logger.warning(f"记录失败现场截图时出错，已忽略: {e}")
+            return
+
+        frames = self._frames.setdefault(step, deque())
+        if len(frames) >= self.frames_per_step:
+            self._total_bytes -= len(frames.popleft()['data'])
+        self._seq += 1
+        frames.append({
+            'seq': self._seq,
+            'time': time.time(),
+            'region': list(region) if region else [0, 0, width, height],
+            'score': None if score is None else round(float(score), 4),
+            'location': list(location) if location else None,
+            'info': info,
+            'data': data,
+        })
+        self._total_bytes += len(data)
+        self._evict()
+
+    @property
+    def total_bytes(self):
+        """当前所有缓存帧占用的字节数"""
+        return self._total_bytes
+
+    def frame_count(self, step=None):
+        """返回某个步骤 (step 为 None 时为全部步骤) 当前缓存的帧数"""
+        if step is None:
+            return sum(len(frames) for frames in self._frames.values())
+        return len(self._frames.get(step, ()))
+
+    def discard(self, step):
+        """步骤成功后丢弃其缓存帧"""
+        frames = self._frames.pop(step, None)
+        if frames:
+            self._total_bytes -= sum(len(entry['data']) for entry in frames)
+
+    def dump(self, step, template_path=None, confidence=None, reason='', extra=None):
+        """
+        将某个步骤的缓存帧与匹配得分写入带时间戳的目录，并清空该步骤的缓存
+
+        诊断代码不能中断被诊断的任务，因此任何异常都只记录日志并返回 None。
+
+        :param step: 步骤标识
+        :param template_path: 模板图片路径，会复制一份到输出目录
+        :param confidence: 本次查找使用的置信度阈值
+        :param reason: 失败原因描述
+        :param extra: 需要一并写入 meta.json 的附加信息
+        :return: 输出目录路径；没有缓存帧或写入失败时返回 None
+        """
+        frames = self._frames.get(step)
+        if not frames:
+            return None
+
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        name = re.sub(r'[^\w.-]+', '_', os.path.splitext(os.path.basename(str(step)))[0])
+        # 秒级时间戳可能重复，附加帧序号保证目录唯一；目录已存在时直接报错而不是混写
+        out_dir = os.path.join(self.dump_dir, f"{stamp}_{self._seq:06d}_{name}")
+        created = False
+
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            os.mkdir(out_dir)
+            created = True
+            if template_path and os.path.exists(template_path):
+                shutil.copy(template_path, os.path.join(out_dir, 'template' + os.path.splitext(template_path)[1]))
+
+            frame_meta = []
+            for index, entry in enumerate(frames):
+                file_name = f"frame_{index:02d}.jpg"
+                with open(os.path.join(out_dir, file_name), 'wb') as f:
+                    f.write(entry['data'])
+                frame_meta.append({
+                    'file': file_name,
+                    'time': time.strftime('%H:%M:%S', time.localtime(entry['time'])) + f".{int(entry['time'] * 1000) % 1000:03d}",
+                    'region': entry['region'],
+                    'score': entry['score'],
+                    'best_location': entry['location'],
+                    'info': entry['info'],
+                })
+
+            meta = {
+                'step': str(step),
+                'reason': reason,
+                'confidence': confidence,
+                'scale': self.scale,
+                'best_score': max((m['score'] for m in frame_meta if m['score'] is not None), default=None),
+                'frames': frame_meta,
+                'extra': extra,
+            }
+            with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"写入失败现场目录 '{out_dir}' 时出错: {e}")
+            # 清理写了一半的目录，避免留下缺少 meta.json 的残缺现场
+            if created:
+                shutil.rmtree(out_dir, ignore_errors=True)
+            return None
+        finally:
+            self.discard(step)
+
+        logger.info(f"📦 已保存失败现场 ({len(frame_meta)} 帧) 到: {out_dir}")
+        return out_dir
+
+    def _evict(self):
+        """超出内存预算时，淘汰所有步骤中最旧的帧"""
+        while self._total_bytes > self.max_bytes and self._frames:
+            step = min(self._frames, key=lambda s: self._frames[s][0]['seq'])
+            frames = self._frames[step]
+            self._total_bytes -= len(frames.popleft()['data'])
+            if not frames:
+                del self._frames[step]
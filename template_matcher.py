@@ -0,0 +1,45 @@
+import logging
+import os
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def load_template(image_path):
+    """
+    读取模板图片 (使用 imdecode，兼容中文路径)
+
+    :param image_path: 模板图片路径
+    :return: BGR 格式的 numpy 数组；文件不存在或无法解码时返回 None
+    """
+    template = None
+    if os.path.exists(image_path):
+        template = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if template is None:
+        logger.error(f"❌ 无法读取模板图片: '{image_path}'")
+    return template
+
+
+def template_fits(screenshot, template):
+    """判断模板是否不大于截图，否则 cv2.matchTemplate 会直接报错"""
+    height, width = template.shape[:2]
+    return width <= screenshot.width and height <= screenshot.height
+
+
+def match_template(screenshot, template, region=None):
+    """
+    在截图上进行模板匹配 (与 pyscreeze 内部一致，使用 TM_CCOEFF_NORMED)
+
+    :param screenshot: PIL.Image 截图
+    :param template: load_template 返回的模板
+    :param region: 截图对应的屏幕区域 (left, top, width, height)，None 表示全屏
+    :return: (最高得分, 对应的屏幕中心坐标)
+    """
+    frame = cv2.cvtColor(np.array(screenshot.convert('RGB')), cv2.COLOR_RGB2BGR)
+    result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    height, width = template.shape[:2]
+    left, top = (region[0], region[1]) if region else (0, 0)
+    return float(max_val), (left + max_loc[0] + width // 2, top + max_loc[1] + height // 2)
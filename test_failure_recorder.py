@@ -0,0 +1,134 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from failure_recorder import FailureFrameRecorder
+
+
+def make_frame(width=200, height=120, seed=0):
+    """生成带噪声的合成截图，保证 JPEG 压缩后大小不为零且各不相同"""
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+
+
+class FailureFrameRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dump_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dump_dir, ignore_errors=True)
+
+    def load_meta(self, out_dir):
+        with open(os.path.join(out_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_per_step_cap(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir, frames_per_step=3)
+        for i in range(5):
+            recorder.record('a.png', make_frame(seed=i), info={'page': i + 1})
+        self.assertEqual(recorder.frame_count('a.png'), 3)
+
+        meta = self.load_meta(recorder.dump('a.png'))
+        self.assertEqual([frame['info']['page'] for frame in meta['frames']], [3, 4, 5])
+        self.assertEqual(recorder.total_bytes, 0)
+
+    def test_global_budget_evicts_oldest_across_steps(self):
+        probe = FailureFrameRecorder(dump_dir=self.dump_dir)
+        probe.record('probe', make_frame(seed=0))
+        frame_size = probe.total_bytes
+
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir, frames_per_step=10,
+                                        max_bytes=int(frame_size * 3.5))
+        recorder.record('a.png', make_frame(seed=1))
+        recorder.record('b.png', make_frame(seed=2))
+        recorder.record('a.png', make_frame(seed=3))
+        recorder.record('b.png', make_frame(seed=4))
+        recorder.record('b.png', make_frame(seed=5))
+
+        # 只保留最近的 3 帧：最旧的两帧 (a.png 与 b.png 各一帧) 被跨步骤淘汰
+        self.assertLessEqual(recorder.total_bytes, recorder.max_bytes)
+        self.assertEqual(recorder.frame_count(), 3)
+        self.assertEqual(recorder.frame_count('a.png'), 1)
+        self.assertEqual(recorder.frame_count('b.png'), 2)
+
+        recorder.discard('a.png')
+        recorder.discard('b.png')
+        self.assertEqual(recorder.total_bytes, 0)
+
+    def test_step_removed_when_all_frames_evicted(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir, max_bytes=1)
+        recorder.record('a.png', make_frame(seed=1))
+        self.assertEqual(recorder.frame_count(), 0)
+        self.assertEqual(recorder.total_bytes, 0)
+
+    def test_discard_keeps_byte_count(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir)
+        recorder.record('a.png', make_frame(seed=1))
+        only_a = recorder.total_bytes
+        recorder.record('b.png', make_frame(seed=2))
+        recorder.discard('b.png')
+        recorder.discard('missing.png')
+        self.assertEqual(recorder.frame_count('b.png'), 0)
+        self.assertEqual(recorder.total_bytes, only_a)
+
+    def test_dump_writes_frames_and_meta(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir)
+        recorder.record('friend_avatars/a.png', make_frame(seed=1), region=(10, 20, 200, 120),
+                        score=0.51234, location=(60, 70), info={'page': 1})
+        recorder.record('friend_avatars/a.png', make_frame(seed=2), region=(10, 20, 200, 120),
+                        score=0.7, location=(80, 90), info={'page': 2})
+        before_other = recorder.total_bytes
+        recorder.record('other.png', make_frame(seed=3))
+        other_bytes = recorder.total_bytes - before_other
+
+        out_dir = recorder.dump('friend_avatars/a.png', confidence=0.75, reason='test',
+                                extra={'step': 'ignored', 'max_scrolls': 2})
+        self.assertIsNotNone(out_dir)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, 'frame_00.jpg')))
+        self.assertTrue(os.path.exists(os.path.join(out_dir, 'frame_01.jpg')))
+        meta = self.load_meta(out_dir)
+        self.assertEqual(meta['step'], 'friend_avatars/a.png')
+        self.assertEqual(meta['best_score'], 0.7)
+        self.assertEqual(meta['extra'], {'step': 'ignored', 'max_scrolls': 2})
+        self.assertEqual([frame['info']['page'] for frame in meta['frames']], [1, 2])
+        self.assertEqual(meta['frames'][0]['score'], 0.5123)
+        self.assertEqual(meta['frames'][0]['region'], [10, 20, 200, 120])
+
+        self.assertEqual(recorder.frame_count('friend_avatars/a.png'), 0)
+        self.assertEqual(recorder.total_bytes, other_bytes)
+
+    def test_dumps_in_same_second_do_not_collide(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir)
+        recorder.record('a.png', make_frame(seed=1))
+        recorder.record('a.png', make_frame(seed=2))
+        first = recorder.dump('a.png')
+        recorder.record('a.png', make_frame(seed=3))
+        second = recorder.dump('a.png')
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(self.load_meta(first)['frames']), 2)
+        self.assertEqual(len(self.load_meta(second)['frames']), 1)
+        self.assertEqual(sorted(os.listdir(second)), ['frame_00.jpg', 'meta.json'])
+
+    def test_dump_without_frames_returns_none(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir)
+        self.assertIsNone(recorder.dump('a.png'))
+        self.assertEqual(os.listdir(self.dump_dir), [])
+
+    def test_dump_never_raises_and_leaves_no_orphan(self):
+        recorder = FailureFrameRecorder(dump_dir=self.dump_dir)
+        recorder.record('a.png', make_frame(seed=1))
+        self.assertIsNone(recorder.dump('a.png', extra={'bad': object()}))
+        self.assertEqual(os.listdir(self.dump_dir), [])
+        self.assertEqual(recorder.frame_count(), 0)
+        self.assertEqual(recorder.total_bytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
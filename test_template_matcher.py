@@ -0,0 +1,73 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from template_matcher import load_template, template_fits, match_template
+
+
+def make_screenshot(width=240, height=160, seed=0):
+    """生成带噪声的合成截图，模板在其中只有唯一的最佳匹配位置"""
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+
+
+def crop_template(screenshot, left, top, width, height):
+    """从截图中裁出模板，并转换为 load_template 返回的 BGR 格式"""
+    crop = screenshot.crop((left, top, left + width, top + height))
+    return cv2.cvtColor(np.array(crop), cv2.COLOR_RGB2BGR)
+
+
+class MatchTemplateTest(unittest.TestCase):
+
+    def test_center_without_region(self):
+        screenshot = make_screenshot()
+        template = crop_template(screenshot, 50, 30, 21, 16)
+        score, location = match_template(screenshot, template)
+        self.assertGreater(score, 0.99)
+        self.assertEqual(location, (50 + 10, 30 + 8))
+
+    def test_center_includes_region_offset(self):
+        screenshot = make_screenshot(seed=1)
+        template = crop_template(screenshot, 120, 70, 30, 20)
+        score, location = match_template(screenshot, template, region=(1440, 108, 240, 160))
+        self.assertGreater(score, 0.99)
+        self.assertEqual(location, (1440 + 120 + 15, 108 + 70 + 10))
+
+    def test_template_fits(self):
+        screenshot = make_screenshot(width=100, height=40)
+        self.assertTrue(template_fits(screenshot, np.zeros((40, 100, 3), dtype=np.uint8)))
+        self.assertFalse(template_fits(screenshot, np.zeros((41, 20, 3), dtype=np.uint8)))
+        self.assertFalse(template_fits(screenshot, np.zeros((10, 101, 3), dtype=np.uint8)))
+
+
+class LoadTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_loads_chinese_path_as_bgr(self):
+        path = os.path.join(self.tmp_dir, '好友头像.png')
+        Image.new('RGB', (8, 6), (255, 0, 0)).save(path)
+        template = load_template(path)
+        self.assertEqual(template.shape, (6, 8, 3))
+        self.assertEqual(template[0, 0].tolist(), [0, 0, 255])
+
+    def test_missing_or_corrupt_returns_none(self):
+        self.assertIsNone(load_template(os.path.join(self.tmp_dir, 'missing.png')))
+        path = os.path.join(self.tmp_dir, 'broken.png')
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(load_template(path))
+
+
+if __name__ == '__main__':
+    unittest.main()